@@ -3,7 +3,17 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from collections import Counter
+import scipy.sparse as sp
+from numba import njit
+import ast
+from collections import Counter, defaultdict
+from functools import lru_cache
+from itertools import combinations
+
+# Threshold yang sama dengan saat association_rules.csv dibuat
+MIN_SUPPORT = 0.01
+MIN_CONFIDENCE = 0.3
+MIN_LIFT = 2.0
 
 # Konfigurasi halaman
 st.set_page_config(
@@ -23,28 +33,173 @@ page = st.sidebar.radio(
     ["📊 Dashboard", "🔍 Product Analysis", "💡 Recommendations", "📈 Association Rules"]
 )
 
+@njit(cache=True)
+def count_co_occurrences(items, offsets, trans_ids, n_items):
+    # Hitung kemunculan tiap item pada transaksi terpilih (layout CSR)
+    counts = np.zeros(n_items, np.int64)
+    for t in trans_ids:
+        for j in range(offsets[t], offsets[t + 1]):
+            counts[items[j]] += 1
+    return counts
+
+@lru_cache(maxsize=None)
+def parse_itemset(value):
+    # Kolom rules disimpan sebagai string "frozenset({...})"
+    value = value.strip()
+    if value.startswith('frozenset(') and value.endswith(')'):
+        value = value[len('frozenset('):-1]
+    return frozenset(ast.literal_eval(value))
+
 # Load data
 @st.cache_data
 def load_data():
     # Load transactions
-    df = pd.read_csv('groceries.csv')
-    transactions = []
-    for i in range(len(df)):
-        trans = [str(item).strip() for item in df.iloc[i].tolist()
-                if pd.notna(item) and str(item).strip() != '']
-        transactions.append(trans[1:])
+    df = pd.read_csv('groceries.csv', engine='pyarrow', dtype_backend='pyarrow')
+    # Kolom pertama hanya jumlah item, langsung dilewati
+    raw = df.iloc[:, 1:].to_numpy(dtype=object)
+    transactions = [
+        [str(item).strip() for item in row if pd.notna(item) and str(item).strip() != '']
+        for row in raw
+    ]
+
+    # Encode item ke integer id lalu bentuk matriks CSR (transaksi x item)
+    codes, item_names = pd.factorize(np.concatenate(transactions))
+    item_to_id = {item: i for i, item in enumerate(item_names)}
+    rows = np.repeat(np.arange(len(transactions)), [len(t) for t in transactions])
+    basket_matrix = sp.csr_matrix(
+        (np.ones(len(codes), dtype=np.int32), (rows, codes)),
+        shape=(len(transactions), len(item_names))
+    )
+    trans_lengths = np.diff(basket_matrix.indptr).astype(np.int32)
+    item_support = np.asarray(basket_matrix.sum(axis=0)).ravel() / len(transactions)
+
+    # Inverted index: item -> daftar id transaksi yang memuat item tersebut
+    item_index = defaultdict(list)
+    for tid, transaction in enumerate(transactions):
+        for item in set(transaction):
+            item_index[item].append(tid)
+    item_index = dict(item_index)
 
     # Load association rules
-    rules = pd.read_csv('association_rules.csv')
+    rules = pd.read_csv(
+        'association_rules.csv',
+        engine='pyarrow',
+        usecols=['antecedents', 'consequents', 'support', 'confidence', 'lift', 'conviction']
+    )
+    rules['antecedents'] = rules['antecedents'].map(parse_itemset)
+    rules['consequents'] = rules['consequents'].map(parse_itemset)
+    for col in ['support', 'confidence', 'lift', 'conviction']:
+        rules[col] = rules[col].astype(np.float32)
+    # Urutkan sekali berdasarkan lift; filter di halaman tetap menjaga urutan ini
+    rules = rules.sort_values('lift', ascending=False, ignore_index=True)
 
     # Hitung item frequencies
-    all_items = [item for transaction in transactions for item in transaction]
-    item_freq = pd.Series(all_items).value_counts().reset_index()
-    item_freq.columns = ['item', 'frequency']
+    item_counts = Counter()
+    for transaction in transactions:
+        item_counts.update(transaction)
+    item_freq = pd.DataFrame(item_counts.most_common(), columns=['item', 'frequency'])
+
+    # Daftar pilihan produk untuk selectbox / multiselect
+    top50_items = item_freq['item'].head(50).tolist()
+    top100_items = item_freq['item'].head(100).tolist()
+    item_freq['item'] = item_freq['item'].astype('category')
+
+    return (transactions, basket_matrix, trans_lengths, item_names, item_to_id, item_support,
+            rules, item_freq, item_index, top50_items, top100_items)
+
+(transactions, basket_matrix, trans_lengths, item_names, item_to_id, item_support,
+ rules, item_freq, item_index, top50_items, top100_items) = load_data()
+
+# Cache hasil filter per kombinasi slider
+@st.cache_data
+def filter_rules(min_confidence, min_lift, min_support):
+    # Threshold ikut float32 supaya nilai tepat di batas slider tidak terbuang
+    return rules[
+        (rules['confidence'] >= np.float32(min_confidence)) &
+        (rules['lift'] >= np.float32(min_lift)) &
+        (rules['support'] >= np.float32(min_support))
+    ]
+
+@st.cache_data
+def recommend_from_matrix(selected_products):
+    # Hitung rules (subset keranjang -> item) langsung dari basket_matrix
+    n_trans = basket_matrix.shape[0]
+    selected_ids = [item_to_id[product] for product in selected_products]
+    candidates = []
+
+    for size in range(1, len(selected_ids) + 1):
+        for antecedent_ids in combinations(selected_ids, size):
+            antecedent_ids = list(antecedent_ids)
+            mask = np.asarray(basket_matrix[:, antecedent_ids].sum(axis=1)).ravel() == size
+            antecedent_count = mask.sum()
+            if antecedent_count / n_trans < MIN_SUPPORT:
+                continue
+
+            pair_counts = np.asarray(basket_matrix[mask].sum(axis=0)).ravel()
+            support = pair_counts / n_trans
+            confidence = pair_counts / antecedent_count
+            lift = confidence / item_support
+
+            keep = (support >= MIN_SUPPORT) & (confidence >= MIN_CONFIDENCE) & (lift >= MIN_LIFT)
+            keep[selected_ids] = False
+            consequent_ids = np.flatnonzero(keep)
+
+            antecedents = frozenset(item_names[antecedent_ids].tolist())
+            candidates.append(pd.DataFrame({
+                'antecedents': [antecedents] * len(consequent_ids),
+                'product': item_names[consequent_ids],
+                'confidence': confidence[consequent_ids],
+                'lift': lift[consequent_ids],
+                'support': support[consequent_ids]
+            }))
+
+    if not candidates:
+        return pd.DataFrame(columns=['antecedents', 'product', 'confidence', 'lift', 'support'])
+    return pd.concat(candidates, ignore_index=True)
+
+# Cache figure Plotly; input bytes supaya hashing Streamlit murah
+@st.cache_data
+def build_length_histogram(lengths_bytes):
+    return px.histogram(
+        x=np.frombuffer(lengths_bytes, dtype=np.int32),
+        nbins=30,
+        title="Distribution of Items per Transaction",
+        labels={'x': 'Number of Items', 'y': 'Frequency'},
+        color_discrete_sequence=['#2E86AB']
+    )
+
+@st.cache_data
+def build_top_products_bar(top_items):
+    fig = px.bar(
+        top_items,
+        x='frequency',
+        y='item',
+        orientation='h',
+        title="Most Frequently Purchased Items",
+        color='frequency',
+        color_continuous_scale='Viridis'
+    )
+    fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+    return fig
 
-    return transactions, rules, item_freq
+@st.cache_data
+def build_rules_scatter(top_rules):
+    # Plotly tidak bisa serialisasi frozenset, ubah ke string untuk hover
+    plot_rules = top_rules.assign(
+        antecedents=lambda d: d['antecedents'].map(', '.join),
+        consequents=lambda d: d['consequents'].map(', '.join)
+    )
 
-transactions, rules, item_freq = load_data()
+    return px.scatter(
+        plot_rules,
+        x='support',
+        y='confidence',
+        size='lift',
+        color='lift',
+        hover_data=['antecedents', 'consequents'],
+        title='Association Rules (Support vs Confidence)',
+        color_continuous_scale='Viridis'
+    )
 
 if page == "📊 Dashboard":
     st.header("📊 Dashboard Overview")
@@ -59,34 +214,16 @@ if page == "📊 Dashboard":
         st.metric("Unique Products", unique_items)
 
     with col3:
-        avg_items = np.mean([len(t) for t in transactions])
-        st.metric("Avg Items per Transaction", f"{avg_items:.2f}")
+        st.metric("Avg Items per Transaction", f"{trans_lengths.mean():.2f}")
 
     # Transaction length distribution
     st.subheader("Transaction Size Distribution")
-    trans_lengths = [len(t) for t in transactions]
-
-    fig1 = px.histogram(
-        x=trans_lengths,
-        nbins=30,
-        title="Distribution of Items per Transaction",
-        labels={'x': 'Number of Items', 'y': 'Frequency'},
-        color_discrete_sequence=['#2E86AB']
-    )
+    fig1 = build_length_histogram(trans_lengths.tobytes())
     st.plotly_chart(fig1, use_container_width=True)
 
     # Top products
     st.subheader("Top 20 Most Popular Products")
-    fig2 = px.bar(
-        item_freq.head(20),
-        x='frequency',
-        y='item',
-        orientation='h',
-        title="Most Frequently Purchased Items",
-        color='frequency',
-        color_continuous_scale='Viridis'
-    )
-    fig2.update_layout(yaxis={'categoryorder': 'total ascending'})
+    fig2 = build_top_products_bar(item_freq.head(20))
     st.plotly_chart(fig2, use_container_width=True)
 
 elif page == "🔍 Product Analysis":
@@ -95,23 +232,29 @@ elif page == "🔍 Product Analysis":
     # Pilih produk untuk dianalisis
     selected_product = st.selectbox(
         "Select a product to analyze",
-        item_freq['item'].head(50).tolist()
+        top50_items
     )
 
     if selected_product:
+        product_tids = item_index[selected_product]
+
         # Hitung co-occurrence
-        co_occurrences = Counter()
-        for transaction in transactions:
-            if selected_product in transaction:
-                for item in transaction:
-                    if item != selected_product:
-                        co_occurrences[item] += 1
-
-        # Buat DataFrame co-occurrence
-        co_occur_df = pd.DataFrame(
-            co_occurrences.items(),
-            columns=['product', 'co_occurrence_count']
-        ).sort_values('co_occurrence_count', ascending=False).head(20)
+        product_id = item_to_id[selected_product]
+        co_counts = count_co_occurrences(
+            basket_matrix.indices,
+            basket_matrix.indptr,
+            np.asarray(product_tids, dtype=np.int64),
+            len(item_names)
+        )
+        co_counts[product_id] = 0
+
+        # Buat DataFrame co-occurrence dari 20 item teratas
+        top = np.argpartition(co_counts, -min(20, len(co_counts)))[-20:]
+        top = top[co_counts[top] > 0]
+        co_occur_df = pd.DataFrame({
+            'product': item_names[top],
+            'co_occurrence_count': co_counts[top]
+        }).sort_values('co_occurrence_count', ascending=False)
 
         st.subheader(f"Products Frequently Bought With {selected_product}")
 
@@ -133,7 +276,7 @@ elif page == "🔍 Product Analysis":
         with col2:
             st.metric(
                 "Transactions with this product",
-                sum(1 for t in transactions if selected_product in t)
+                len(product_tids)
             )
             st.metric(
                 "Total occurrences",
@@ -142,7 +285,7 @@ elif page == "🔍 Product Analysis":
 
         # Show transactions containing this product
         st.subheader("Sample Transactions")
-        sample_trans = [t for t in transactions if selected_product in t][:10]
+        sample_trans = [transactions[tid] for tid in product_tids[:10]]
         for i, trans in enumerate(sample_trans, 1):
             st.write(f"{i}. {', '.join(trans)}")
 
@@ -152,70 +295,51 @@ elif page == "💡 Recommendations":
     # Multi-select untuk memilih produk
     selected_products = st.multiselect(
         "Select products in cart",
-        item_freq['item'].head(100).tolist(),
+        top100_items,
         max_selections=5
     )
 
     if selected_products:
         st.subheader("Recommended Products to Add:")
 
-        # Cari rules yang relevan
-        recommendations = {}
-
-        for idx, row in rules.iterrows():
-            antecedents = eval(row['antecedents']) if isinstance(row['antecedents'], str) else row['antecedents']
-            consequents = eval(row['consequents']) if isinstance(row['consequents'], str) else row['consequents']
-
-            # Cek jika antecedents subset dari selected_products
-            if all(item in selected_products for item in antecedents):
-                for consequent in consequents:
-                    if consequent not in selected_products:
-                        if consequent not in recommendations:
-                            recommendations[consequent] = {
-                                'confidence': row['confidence'],
-                                'lift': row['lift'],
-                                'support': row['support']
-                            }
-                        else:
-                            # Update dengan rule terbaik
-                            if row['confidence'] > recommendations[consequent]['confidence']:
-                                recommendations[consequent] = {
-                                    'confidence': row['confidence'],
-                                    'lift': row['lift'],
-                                    'support': row['support']
-                                }
-
-        if recommendations:
-            # Urutkan berdasarkan confidence
-            rec_df = pd.DataFrame([
-                {
-                    'product': product,
-                    'confidence': data['confidence'],
-                    'lift': data['lift'],
-                    'support': data['support']
-                }
-                for product, data in recommendations.items()
-            ]).sort_values('confidence', ascending=False).head(10)
-
-            # Tampilkan rekomendasi
-            for idx, row in rec_df.iterrows():
-                with st.expander(f"➕ {row['product']}"):
-                    st.metric("Confidence", f"{row['confidence']:.2%}")
-                    st.metric("Lift", f"{row['lift']:.2f}")
-                    st.metric("Support", f"{row['support']:.3f}")
-
-                    # Tampilkan rules terkait
-                    related_rules = rules[
-                        rules['consequents'].apply(
-                            lambda x: row['product'] in (eval(x) if isinstance(x, str) else x)
-                        )
-                    ].head(3)
-
-                    for _, rule in related_rules.iterrows():
-                        antecedents = eval(rule['antecedents']) if isinstance(rule['antecedents'], str) else rule['antecedents']
-                        st.write(f"If {', '.join(antecedents)} → Then {row['product']}")
-                        st.write(f"Confidence: {rule['confidence']:.2%}, Lift: {rule['lift']:.2f}")
-                        st.write("---")
+        # Rules dengan antecedents subset dari selected_products
+        candidates = recommend_from_matrix(selected_products)
+
+        if not candidates.empty:
+            # Ambil rule terbaik per produk, lalu 10 teratas berdasarkan confidence
+            best = candidates.loc[candidates.groupby('product', sort=False)['confidence'].idxmax()]
+            rec_df = best.nlargest(10, 'confidence')
+
+            # Rules terkait per produk (maks. 3), digabung jadi satu string
+            ranked = candidates.sort_values('confidence', ascending=False)
+            ranked = ranked.groupby('product', sort=False).head(3)
+            ranked['rule'] = [
+                f"If {', '.join(antecedents)} → {product} ({confidence:.2%}, lift {lift:.2f})"
+                for antecedents, product, confidence, lift in zip(
+                    ranked['antecedents'], ranked['product'], ranked['confidence'], ranked['lift']
+                )
+            ]
+            top_rules = ranked.groupby('product', sort=False)['rule'].agg('; '.join)
+
+            # Tampilkan rekomendasi dalam satu tabel
+            display_df = rec_df[['product', 'confidence', 'lift', 'support']].assign(
+                confidence=lambda d: d['confidence'] * 100,
+                top_rules=lambda d: d['product'].map(top_rules)
+            )
+            st.dataframe(
+                display_df,
+                column_config={
+                    'product': st.column_config.TextColumn("Product"),
+                    'confidence': st.column_config.ProgressColumn(
+                        "Confidence", format="%.2f%%", min_value=0, max_value=100
+                    ),
+                    'lift': st.column_config.NumberColumn("Lift", format="%.2f"),
+                    'support': st.column_config.NumberColumn("Support", format="%.3f"),
+                    'top_rules': st.column_config.TextColumn("Related Rules", width='large')
+                },
+                hide_index=True,
+                use_container_width=True
+            )
         else:
             st.info("No specific recommendations found. Try adding more products to your cart.")
 
@@ -257,48 +381,39 @@ elif page == "📈 Association Rules":
         )
 
     # Filter rules
-    filtered_rules = rules[
-        (rules['confidence'] >= min_confidence) &
-        (rules['lift'] >= min_lift) &
-        (rules['support'] >= min_support)
-    ].sort_values('lift', ascending=False)
+    filtered_rules = filter_rules(min_confidence, min_lift, min_support)
 
     st.subheader(f"Found {len(filtered_rules)} Rules")
 
-    # Tampilkan rules
-    for idx, row in filtered_rules.head(50).iterrows():
-        antecedents = eval(row['antecedents']) if isinstance(row['antecedents'], str) else row['antecedents']
-        consequents = eval(row['consequents']) if isinstance(row['consequents'], str) else row['consequents']
-
-        with st.expander(f"{', '.join(antecedents)} → {', '.join(consequents)}"):
-            col1, col2, col3, col4 = st.columns(4)
-
-            with col1:
-                st.metric("Support", f"{row['support']:.3f}")
-
-            with col2:
-                st.metric("Confidence", f"{row['confidence']:.2%}")
-
-            with col3:
-                st.metric("Lift", f"{row['lift']:.2f}")
-
-            with col4:
-                st.metric("Conviction", f"{row['conviction']:.2f}")
+    # Tampilkan rules dalam satu tabel
+    display_rules = filtered_rules.head(50)[
+        ['antecedents', 'consequents', 'support', 'confidence', 'lift', 'conviction']
+    ].assign(
+        antecedents=lambda d: d['antecedents'].map(', '.join),
+        consequents=lambda d: d['consequents'].map(', '.join),
+        confidence=lambda d: d['confidence'] * 100
+    )
+    st.dataframe(
+        display_rules,
+        column_config={
+            'antecedents': st.column_config.TextColumn("If"),
+            'consequents': st.column_config.TextColumn("Then"),
+            'support': st.column_config.NumberColumn("Support", format="%.3f"),
+            'confidence': st.column_config.ProgressColumn(
+                "Confidence", format="%.2f%%", min_value=0, max_value=100
+            ),
+            'lift': st.column_config.NumberColumn("Lift", format="%.2f"),
+            'conviction': st.column_config.NumberColumn("Conviction", format="%.2f")
+        },
+        hide_index=True,
+        use_container_width=True
+    )
 
     # Visualisasi rules
     if len(filtered_rules) > 0:
         st.subheader("Rules Visualization")
 
-        fig = px.scatter(
-            filtered_rules.head(50),
-            x='support',
-            y='confidence',
-            size='lift',
-            color='lift',
-            hover_data=['antecedents', 'consequents'],
-            title='Association Rules (Support vs Confidence)',
-            color_continuous_scale='Viridis'
-        )
+        fig = build_rules_scatter(filtered_rules.head(50))
         st.plotly_chart(fig, use_container_width=True)
 
 # Footer